@@ -1,25 +1,50 @@
 import os
+import re
 import sys
 import json
 import base64
-import mimetypes
-import argparse
+import functools
+import io
 import asyncio
 import time
-from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
-from dotenv import load_dotenv, find_dotenv
-from hypha_rpc import connect_to_server, login
-import yaml
-import glob
-from pathlib import PurePosixPath
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, redirect_stdout
+from contextvars import ContextVar
+from pathlib import Path, PurePosixPath
+from types import SimpleNamespace
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Tuple, Union
 
 DEFAULT_IGNORED_DIRS = {"__pycache__", ".git", ".venv", ".idea", ".pytest_cache", ".mypy_cache", "build", "dist", "__pypackages__"}
 DEFAULT_IGNORED_FILES = {".DS_Store", ".gitignore", ".gitattributes", ".env", ".env.local", ".env.development", ".env.production"}
 DEFAULT_IGNORED_SUFFIXES = {".pyc", ".pyo", ".swp", ".tmp", ".bak"}
+# Upload formats for common suffixes, checked before consulting the mimetypes database
+FORMAT_BY_SUFFIX = {
+    ".json": "json",
+    ".py": "text",
+    ".txt": "text",
+    ".md": "text",
+    ".yaml": "text",
+    ".yml": "text",
+    ".html": "text",
+    ".css": "text",
+    ".js": "text",
+}
+# Integer `exp` claim in a raw JWT payload, followed by the next member or the end
+JWT_EXP_PATTERN = re.compile(rb'"exp"\s*:\s*(\d+)\s*[,}]')
+# Must be a multiple of 3 so each chunk encodes without intermediate padding
+BASE64_CHUNK_SIZE = 57 * 1024
+
+
+def maybe_load_env() -> None:
+    """Load ./.env, without overriding variables already set in the environment."""
+    env_path = Path.cwd() / ".env"
+    if not env_path.is_file():
+        return
 
+    from dotenv import load_dotenv
 
-load_dotenv(dotenv_path=find_dotenv(usecwd=True))
+    load_dotenv(env_path, override=False)
 
 def get_bool_env(varname: str, default: bool = False) -> bool:
     val = os.getenv(varname)
@@ -27,45 +52,70 @@ def get_bool_env(varname: str, default: bool = False) -> bool:
         return default
     return val.lower() in ("1", "true", "yes", "on")
 
+@functools.lru_cache(maxsize=1)
 def get_token_file_path() -> Path:
-    """Get the path to the token cache file."""
+    """Get the path to the token cache file.
+
+    Resolved once per process; the CLI never changes directory.
+    """
     return Path.cwd() / ".hypha_token"
 
+@functools.lru_cache(maxsize=8)
+def _decode_jwt_bytes(token: str) -> bytes:
+    """Return the raw (unverified) payload bytes of a JWT token."""
+    # JWT has 3 parts: header.payload.signature
+    parts = token.split('.')
+    if len(parts) != 3:
+        raise ValueError("Invalid JWT format")
+
+    # Decode the payload (second part); JWTs use unpadded base64url
+    payload_b64 = parts[1]
+    return base64.urlsafe_b64decode(payload_b64 + '=' * (-len(payload_b64) % 4))
+
+@functools.lru_cache(maxsize=8)
+def _decode_jwt_payload(token: str) -> Dict[str, Any]:
+    """Decode (without verifying) the payload of a JWT token.
+
+    Results are cached, so callers must not mutate the returned dict.
+    The server re-validates the signature on connect.
+    """
+    return json.loads(_decode_jwt_bytes(token).decode('utf-8'))
+
+def _get_token_exp(token: str) -> Optional[int]:
+    """Get the `exp` claim of a JWT token, without parsing the whole payload if possible."""
+    payload = _decode_jwt_bytes(token)
+    # Only trust the scan if no nested claim could also be called "exp"
+    if payload.count(b'"exp"') == 1:
+        match = JWT_EXP_PATTERN.search(payload)
+        if match:
+            return int(match.group(1))
+    # Unusual layout (e.g. a non-integer or nested exp); let the JSON parser decide
+    return _decode_jwt_payload(token).get('exp')
+
 def is_token_expired(token: str) -> bool:
-    """Check if a JWT token is expired by parsing its payload."""
+    """Check if a JWT token is expired by parsing its payload.
+
+    This is the check used on the connect path; it only compares ``exp``
+    against the clock. Use get_token_expiration_info() for display.
+    """
     try:
-        # JWT has 3 parts: header.payload.signature
-        parts = token.split('.')
-        if len(parts) != 3:
-            return True
-        
-        # Decode the payload (second part)
-        payload_b64 = parts[1]
-        # Add padding if needed for base64 decoding
-        payload_b64 += '=' * (4 - len(payload_b64) % 4)
-        payload_bytes = base64.b64decode(payload_b64)
-        payload = json.loads(payload_bytes.decode('utf-8'))
-        
-        # Check expiration time
-        exp = payload.get('exp')
-        if exp is None:
-            return True
-        
-        current_time = int(time.time())
-        return current_time >= exp
-        
+        exp = _get_token_exp(token)
+        return exp is None or time.time() >= exp
     except Exception:
-        # If we can't parse the token, consider it expired
+        # If we can't parse the token (or its exp is not a number), consider it expired
         return True
 
 def save_token_to_file(token: str) -> None:
     """Save token to local cache file."""
     try:
         token_file = get_token_file_path()
-        with open(token_file, 'w', encoding='utf-8') as f:
+        # Create the file readable only by owner, so the token is never exposed
+        fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # The mode only applies on creation; tighten a pre-existing file
+            if os.fstat(fd).st_mode & 0o077:
+                token_file.chmod(0o600)
             f.write(token)
-        # Set file permissions to be readable only by owner
-        token_file.chmod(0o600)
         print(f"💾 Token saved to {token_file}")
     except Exception as e:
         print(f"⚠️ Warning: Could not save token to file: {e}")
@@ -99,22 +149,10 @@ def load_token_from_file() -> Optional[str]:
         return None
 
 def get_token_expiration_info(token: str) -> Dict[str, Any]:
-    """Get expiration information from a JWT token."""
+    """Get expiration information from a JWT token (used by debug-token)."""
     try:
-        # JWT has 3 parts: header.payload.signature
-        parts = token.split('.')
-        if len(parts) != 3:
-            return {"valid": False, "error": "Invalid JWT format"}
-        
-        # Decode the payload (second part)
-        payload_b64 = parts[1]
-        # Add padding if needed for base64 decoding
-        payload_b64 += '=' * (4 - len(payload_b64) % 4)
-        payload_bytes = base64.b64decode(payload_b64)
-        payload = json.loads(payload_bytes.decode('utf-8'))
-        
         # Check expiration time
-        exp = payload.get('exp')
+        exp = _decode_jwt_payload(token).get('exp')
         if exp is None:
             return {"valid": False, "error": "No expiration time in token"}
         
@@ -139,31 +177,23 @@ def format_time_remaining(seconds: int) -> str:
     if seconds <= 0:
         return "EXPIRED"
     
-    if seconds < 60:
-        return f"{seconds} seconds"
-    elif seconds < 3600:
-        minutes = seconds // 60
-        remaining_seconds = seconds % 60
-        if remaining_seconds == 0:
-            return f"{minutes} minutes"
-        else:
-            return f"{minutes} minutes {remaining_seconds} seconds"
-    elif seconds < 86400:
-        hours = seconds // 3600
-        remaining_minutes = (seconds % 3600) // 60
-        if remaining_minutes == 0:
-            return f"{hours} hours"
-        else:
-            return f"{hours} hours {remaining_minutes} minutes"
-    else:
-        days = seconds // 86400
-        remaining_hours = (seconds % 86400) // 3600
-        if remaining_hours == 0:
-            return f"{days} days"
-        else:
-            return f"{days} days {remaining_hours} hours"
+    days, rest = divmod(seconds, 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    units = ((days, "days"), (hours, "hours"), (minutes, "minutes"), (secs, "seconds"))
+
+    # Show the largest non-zero unit, plus the next unit down when non-zero
+    major = next(i for i, (value, _) in enumerate(units) if value)
+    value, unit = units[major]
+    text = f"{value} {unit}"
+    if major + 1 < len(units) and units[major + 1][0]:
+        value, unit = units[major + 1]
+        text += f" {value} {unit}"
+    return text
 
 async def connect(disable_ssl: bool = False) -> Any:
+    from hypha_rpc import connect_to_server
+
     server_url = os.getenv("HYPHA_SERVER_URL")
     workspace = os.getenv("HYPHA_WORKSPACE")
     client_id = os.getenv("HYPHA_CLIENT_ID", "hypha-apps-cli")
@@ -171,8 +201,6 @@ async def connect(disable_ssl: bool = False) -> Any:
     # ssl should be False (to disable SSL) or None (to enable SSL)
     ssl = False if disable_ssl else None
 
-    token = None
-    
     # Try to get token from environment variable first
     token = os.getenv("HYPHA_TOKEN")
     
@@ -233,9 +261,12 @@ async def debug_token_info():
     print(f"\n💾 Token File Information:")
     token_file = get_token_file_path()
     print(f"  Token file path: {token_file}")
-    print(f"  Token file exists: {token_file.exists()}")
+    token_file_exists = token_file.exists()
+    print(f"  Token file exists: {token_file_exists}")
     
-    if token_file.exists():
+    # Load the cached token once; it is reused for the resolution order below
+    cached_token = None
+    if token_file_exists:
         try:
             file_stat = token_file.stat()
             file_mode = oct(file_stat.st_mode)[-3:]
@@ -260,7 +291,6 @@ async def debug_token_info():
     print(f"  1. Environment variable (HYPHA_TOKEN): {'✅ FOUND' if env_token else '❌ Not set'}")
     
     if not env_token:
-        cached_token = load_token_from_file()
         print(f"  2. Cached token file: {'✅ FOUND' if cached_token else '❌ Not found/expired'}")
         if not cached_token:
             print(f"  3. Interactive login: ⏳ Would be prompted")
@@ -271,31 +301,89 @@ async def debug_token_info():
     if env_token:
         print(f"  • Environment token found - cached tokens are bypassed")
         print(f"  • To use cached tokens, remove HYPHA_TOKEN from environment")
-    elif not token_file.exists():
+    elif not cached_token:
         print(f"  • No cached token found - run 'python -m hypha_apps_cli login' to create one")
     else:
         print(f"  • Token caching appears to be working correctly")
 
 
-def progress_callback(info: Dict[str, Any]):
-    emoji = {
-        "info": "ℹ️",
-        "success": "✅",
-        "error": "❌",
-        "warning": "⚠️",
-        "upload": "📤",
-        "download": "📥"
-    }.get(info.get("type", ""), "🔸")
-    print(f"{emoji} {info.get('message', '')}")
+PROGRESS_EMOJI = {
+    "info": "ℹ️",
+    "success": "✅",
+    "error": "❌",
+    "warning": "⚠️",
+    "upload": "📤",
+    "download": "📥"
+}
+
+def progress_callback(info: Dict[str, Any], stream: Any = None):
+    emoji = PROGRESS_EMOJI.get(info.get("type", ""), "🔸")
+    (stream or sys.stdout).write(f"{emoji} {info.get('message', '')}\n")
+
+def _bound_progress_callback() -> Callable[[Dict[str, Any]], None]:
+    """
+    Return a progress callback that prints to the calling task's output.
+    
+    The server's progress messages are delivered from the connection's
+    listener task, outside any capture_output() of the command, so the
+    capture buffer is looked up now rather than when a message arrives.
+    """
+    buffers = _CAPTURE_BUFFERS.get()
+    if buffers is None:
+        return progress_callback
+
+    def callback(info: Dict[str, Any]):
+        progress_callback(info, buffers[0])
+    return callback
+
+@functools.lru_cache(maxsize=1)
+def _get_orjson() -> Any:
+    """Return the orjson module if it is installed, otherwise None."""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+def format_json(obj: Any) -> str:
+    """Pretty-print an object as JSON, using orjson when it is available."""
+    orjson = _get_orjson()
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except TypeError:
+            # e.g. non-string keys; let the stdlib encoder handle it
+            pass
+    return json.dumps(obj, indent=2, ensure_ascii=False)
 
 def load_manifest(manifest_path: str) -> Dict[str, Any]:
     with open(manifest_path, "r", encoding="utf-8") as f:
         content = f.read()
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            return yaml.safe_load(content)
+    if manifest_path.endswith(".json"):
+        return json.loads(content)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        import yaml
+
+        # Prefer the libyaml-backed loader when PyYAML was built with it
+        return yaml.load(content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def _infer_format(filepath: Path) -> str:
+    """Return the upload format ("json", "text" or "base64") for a file."""
+    file_format = FORMAT_BY_SUFFIX.get(filepath.suffix.lower())
+    if file_format:
+        return file_format
+
+    import mimetypes
 
+    mime_type, _ = mimetypes.guess_type(filepath)
+    if mime_type == "application/json":
+        return "json"
+    if mime_type and mime_type.startswith("text/"):
+        return "text"
+    return "base64"
 
 def infer_format_and_content(filepath: Path) -> Dict[str, Any]:
     """
@@ -307,15 +395,15 @@ def infer_format_and_content(filepath: Path) -> Dict[str, Any]:
     Returns:
         Dictionary with name, content, and format
     """
-    mime_type, _ = mimetypes.guess_type(filepath)
-    if mime_type == "application/json":
+    file_format = _infer_format(filepath)
+    if file_format == "json":
         with open(filepath, "r", encoding="utf-8") as f:
             return {
                 "name": str(filepath),
                 "content": json.load(f),
                 "format": "json"
             }
-    elif mime_type and mime_type.startswith("text/"):
+    elif file_format == "text":
         with open(filepath, "r", encoding="utf-8") as f:
             return {
                 "name": str(filepath),
@@ -323,15 +411,18 @@ def infer_format_and_content(filepath: Path) -> Dict[str, Any]:
                 "format": "text"
             }
     else:
+        # Encode in chunks so the raw file is never held in memory in full
+        buf = io.BytesIO()
         with open(filepath, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("utf-8")
-            return {
-                "name": str(filepath),
-                "content": encoded,
-                "format": "base64"
-            }
+            while chunk := f.read(BASE64_CHUNK_SIZE):
+                buf.write(base64.b64encode(chunk))
+        return {
+            "name": str(filepath),
+            "content": buf.getvalue().decode("ascii"),
+            "format": "base64"
+        }
 
-def _should_ignore(path: Path) -> bool:
+def _should_ignore(path: Union[Path, os.DirEntry]) -> bool:
     """
     Determine if a file or directory should be ignored based on name or suffix.
     
@@ -393,6 +484,56 @@ def _process_file(path: Path, base_path: Path, module_name: str, is_package: boo
 
 
 
+def _walk_files(directory: Path) -> Iterator[os.DirEntry]:
+    """
+    Yield the non-ignored files under a directory, skipping ignored directories.
+    
+    Uses os.scandir so file/directory checks come from the directory entry
+    itself instead of an extra stat per path.
+    
+    Args:
+        directory: Directory path
+        
+    Yields:
+        Directory entries for each file found
+    """
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if _should_ignore(entry):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+
+def _process_files(paths: Iterable[Path], base_path: Path, module_name: str, is_package: bool) -> List[Dict[str, Any]]:
+    """
+    Process files concurrently, preserving the order in which they are produced.
+    
+    File reads and base64 encoding release the GIL, so a thread pool overlaps
+    them across files; paths are consumed as they are enumerated.
+    
+    Args:
+        paths: Paths of the files to process
+        base_path: Base directory path
+        module_name: Name used as the prefix of the standardized paths
+        is_package: Whether the base directory is a Python package
+        
+    Returns:
+        List of file data dictionaries
+    """
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda path: _process_file(path, base_path, module_name, is_package),
+            paths,
+        )
+        return [file_data for file_data in results if file_data]
+
+
 def _collect_files_from_glob(base_path: Path, pattern: str) -> List[Dict[str, Any]]:
     """
     Collect files matching a glob pattern.
@@ -404,20 +545,15 @@ def _collect_files_from_glob(base_path: Path, pattern: str) -> List[Dict[str, An
     Returns:
         List of file data dictionaries
     """
-    files = []
     module_name = base_path.name
     is_package = _is_python_package(base_path)
     
     # Use glob to find matching files
-    for path in base_path.glob(pattern):
-        if _should_ignore(path):
-            continue
-        if path.is_file():
-            file_data = _process_file(path, base_path, module_name, is_package)
-            if file_data:
-                files.append(file_data)
-                
-    return files
+    paths = (
+        path for path in base_path.glob(pattern)
+        if not _should_ignore(path) and path.is_file()
+    )
+    return _process_files(paths, base_path, module_name, is_package)
 
 
 def _collect_files_from_directory(directory: Path) -> List[Dict[str, Any]]:
@@ -430,20 +566,12 @@ def _collect_files_from_directory(directory: Path) -> List[Dict[str, Any]]:
     Returns:
         List of file data dictionaries
     """
-    files = []
     module_name = directory.name
     is_package = _is_python_package(directory)
     
     # Recursively find all files
-    for path in directory.rglob("*"):
-        if _should_ignore(path):
-            continue
-        if path.is_file():
-            file_data = _process_file(path, directory, module_name, is_package)
-            if file_data:
-                files.append(file_data)
-                
-    return files
+    paths = (Path(entry.path) for entry in _walk_files(directory))
+    return _process_files(paths, directory, module_name, is_package)
 
 
 def collect_files(path_pattern: str) -> List[Dict[str, Any]]:
@@ -481,10 +609,8 @@ def collect_files(path_pattern: str) -> List[Dict[str, Any]]:
     return []
 
 
-async def install_app(app_id: str, source_path: str, manifest_path: str, files_path: str, overwrite: bool = False, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-
+def _gather_payload(source_path: str, manifest_path: str, files_path: Optional[List[str]]):
+    """Read the source, manifest and extra files to upload for an install."""
     with open(source_path, "r", encoding="utf-8") as f:
         source = f.read()
     manifest = load_manifest(manifest_path)
@@ -494,120 +620,147 @@ async def install_app(app_id: str, source_path: str, manifest_path: str, files_p
     if files_path:
         for path in files_path:
             files.extend(collect_files(path))
-    
-    print(f"📦 Installing app '{app_id}' from {source_path} with manifest {manifest_path}...")
-    await controller.install(
-        app_id=app_id,
-        source=source,
-        manifest=manifest,
-        files=files,
-        overwrite=overwrite,
-        progress_callback=progress_callback
-    )
-    
-    app_info = await controller.get_app_info(app_id)
-    print(f"📦 App info: {json.dumps(app_info, indent=2)}")
-    print(f"✅ App '{app_id}' successfully installed")
-    await api.disconnect()
+    return source, manifest, files
 
-async def start_app(app_id: str, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    print(f"🚀 Starting app '{app_id}'...")
-    started = await controller.start(app_id, timeout=30, progress_callback=progress_callback)
-    print("✅ Available services:")
-    for service in started.services:
-        print(f"  - {service.id.split(':')[1]} ({service.get('name', '')}): {service.get('description', 'No description')}")
-    print(f"🚀 Started app '{app_id}' with session ID: {started.id}")
-    await api.disconnect()
-
-async def stop_app(session_id: str, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    running = await controller.list_running()
-    found = next((a for a in running if a.id == session_id), None)
-    if not found:
-        print(f"⚠️ Session '{session_id}' is not currently running.")
-        await api.disconnect()
+@asynccontextmanager
+async def hypha_session(disable_ssl: bool = False, api: Any = None) -> AsyncIterator[Any]:
+    """
+    Provide a server connection for one or more commands.
+    
+    If `api` is given it is reused as-is and left open for the caller;
+    otherwise a new connection is made and disconnected on exit.
+    """
+    if api is not None:
+        yield api
         return
-    await controller.stop(session_id)
-    print(f"🛑 Stopped session '{session_id}'.")
-    await api.disconnect()
-
-async def stop_all_apps(disable_ssl: bool = False):
     api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    running = await controller.list_running()
-    if not running:
-        print("⚠️ No apps are currently running.")
+    try:
+        yield api
+    finally:
         await api.disconnect()
-        return
-    for app in running:
-        await controller.stop(app.id)
-        print(f"🛑 Stopped app '{app.id}'.")
-    await api.disconnect()
 
+async def install_app(app_id: str, source_path: str, manifest_path: str, files_path: str, overwrite: bool = False, disable_ssl: bool = False, verbose: bool = False, api: Any = None):
+    # Read and encode the payload while the connection handshake is in flight
+    payload_task = asyncio.create_task(asyncio.to_thread(_gather_payload, source_path, manifest_path, files_path))
+    async with hypha_session(disable_ssl, api) as api:
+        source, manifest, files = await payload_task
+        controller = await api.get_service("public/server-apps")
+
+        print(f"📦 Installing app '{app_id}' from {source_path} with manifest {manifest_path}...")
+        await controller.install(
+            app_id=app_id,
+            source=source,
+            manifest=manifest,
+            files=files,
+            overwrite=overwrite,
+            progress_callback=_bound_progress_callback()
+        )
+        
+        if verbose:
+            app_info = await controller.get_app_info(app_id)
+            print(f"📦 App info: {format_json(app_info)}")
+        print(f"✅ App '{app_id}' successfully installed")
+
+async def start_app(app_id: str, disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
+        print(f"🚀 Starting app '{app_id}'...")
+        started = await controller.start(app_id, timeout=30, progress_callback=_bound_progress_callback())
+        print("✅ Available services:")
+        for service in started.services:
+            print(f"  - {service.id.split(':')[1]} ({service.get('name', '')}): {service.get('description', 'No description')}")
+        print(f"🚀 Started app '{app_id}' with session ID: {started.id}")
+
+async def stop_app(session_id: str, disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
+        running = await controller.list_running()
+        found = next((a for a in running if a.id == session_id), None)
+        if not found:
+            print(f"⚠️ Session '{session_id}' is not currently running.")
+            return
+        await controller.stop(session_id)
+        print(f"🛑 Stopped session '{session_id}'.")
+
+async def stop_all_apps(disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
+        running = await controller.list_running()
+        if not running:
+            print("⚠️ No apps are currently running.")
+            return
+        # Stop requests are independent, so issue them concurrently
+        results = await asyncio.gather(*(controller.stop(app.id) for app in running), return_exceptions=True)
+        for app, result in zip(running, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Failed to stop app '{app.id}': {result}")
+            else:
+                print(f"🛑 Stopped app '{app.id}'.")
+        if any(isinstance(result, Exception) for result in results):
+            sys.exit(1)
 
-async def stop_all_instances(app_id: str, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    running = await controller.list_running()
-    if not running:
-        print("⚠️ No apps are currently running.")
-        await api.disconnect()
-        return
-    for app in running:
-        if app.app_id != app_id:
-            continue
-        await controller.stop(app.id)
-        print(f"🛑 Stopped instance '{app.id}' of app '{app.app_id}'.")
-    await api.disconnect()
-
-async def uninstall_app(app_id: str, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    await controller.uninstall(app_id)
-    print(f"🗑️ Uninstalled app '{app_id}'")
-    await api.disconnect()
 
-async def list_apps(running: bool = False, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    if running:
-        apps = await controller.list_running()
-        print(f"🟢 Running apps ({len(apps)}):")
-    else:
-        apps = await controller.list_apps()
-        print(f"📦 Installed apps ({len(apps)}):")
+async def stop_all_instances(app_id: str, disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
+        running = await controller.list_running()
+        if not running:
+            print("⚠️ No apps are currently running.")
+            return
+        instances = [app for app in running if app.app_id == app_id]
+        results = await asyncio.gather(*(controller.stop(app.id) for app in instances), return_exceptions=True)
+        for app, result in zip(instances, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Failed to stop instance '{app.id}' of app '{app.app_id}': {result}")
+            else:
+                print(f"🛑 Stopped instance '{app.id}' of app '{app.app_id}'.")
+        if any(isinstance(result, Exception) for result in results):
+            sys.exit(1)
+
+async def uninstall_app(app_id: str, disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
+        await controller.uninstall(app_id)
+        print(f"🗑️ Uninstalled app '{app_id}'")
 
-    for app in apps:
+async def list_apps(running: bool = False, disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
         if running:
-            print(f"- {app.get('name')} (session id: `{app.id}`, app_id: `{app.get('app_id', '')}`): {app.get('description', 'No description')}")
+            apps = await controller.list_running()
+            print(f"🟢 Running apps ({len(apps)}):")
         else:
-            print(f"- {app.get('name')} (app_id: `{app.id}`): {app.get('description', 'No description')}")
-    await api.disconnect()
-
-async def list_services(disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    services = await api.list_services()
-    print(f"🔧 Available services ({len(services)}):")
-    for svc in services:
-        # use an emjoi for the service name
-        print(f"🔧 {svc['id']}")
-        print(f"  {json.dumps(svc, indent=2)}")
-    await api.disconnect()
-
-async def get_logs(session_id: str, disable_ssl: bool = False):
-    api = await connect(disable_ssl=disable_ssl)
-    controller = await api.get_service("public/server-apps")
-    logs = await controller.get_logs(session_id)
-    print(f"🔍 Logs for session '{session_id}':")
-    # print using formated json
-    print(json.dumps(logs, indent=2))
-    await api.disconnect()
+            apps = await controller.list_apps()
+            print(f"📦 Installed apps ({len(apps)}):")
+
+        for app in apps:
+            if running:
+                print(f"- {app.get('name')} (session id: `{app.id}`, app_id: `{app.get('app_id', '')}`): {app.get('description', 'No description')}")
+            else:
+                print(f"- {app.get('name')} (app_id: `{app.id}`): {app.get('description', 'No description')}")
+
+async def list_services(disable_ssl: bool = False, verbose: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        services = await api.list_services()
+        print(f"🔧 Available services ({len(services)}):")
+        for svc in services:
+            # use an emjoi for the service name
+            print(f"🔧 {svc['id']}")
+            if verbose:
+                print(f"  {format_json(svc)}")
+
+async def get_logs(session_id: str, disable_ssl: bool = False, api: Any = None):
+    async with hypha_session(disable_ssl, api) as api:
+        controller = await api.get_service("public/server-apps")
+        logs = await controller.get_logs(session_id)
+        print(f"🔍 Logs for session '{session_id}':")
+        # print using formated json
+        print(format_json(logs))
 
 async def login_command(disable_ssl: bool = False):
     """Perform interactive login and cache token."""
+    from hypha_rpc import login
+
     server_url = os.getenv("HYPHA_SERVER_URL")
     workspace = os.getenv("HYPHA_WORKSPACE")
 
@@ -648,9 +801,200 @@ async def login_command(disable_ssl: bool = False):
         print(f"❌ Login failed: {e}", file=sys.stderr)
         sys.exit(1)
 
-def main():
+async def dispatch_command(args: Any, disable_ssl: bool = False, api: Any = None) -> None:
+    """Run a parsed command, reusing `api` for server commands if given."""
+    verbose = getattr(args, "verbose", False)
+    if args.command == "install":
+        await install_app(args.app_id, args.source, args.manifest, args.files, args.overwrite, disable_ssl=disable_ssl, verbose=verbose, api=api)
+    elif args.command == "start":
+        await start_app(args.app_id, disable_ssl=disable_ssl, api=api)
+    elif args.command == "stop":
+        await stop_app(args.session_id, disable_ssl=disable_ssl, api=api)
+    elif args.command == "stop-all-instances":
+        await stop_all_instances(args.app_id, disable_ssl=disable_ssl, api=api)
+    elif args.command == "stop-all-apps":
+        await stop_all_apps(disable_ssl=disable_ssl, api=api)
+    elif args.command == "uninstall":
+        await uninstall_app(args.app_id, disable_ssl=disable_ssl, api=api)
+    elif args.command == "debug-token":
+        await debug_token_info()
+    elif args.command == "login":
+        await login_command(disable_ssl=disable_ssl)
+    elif args.command == "list-installed":
+        await list_apps(running=False, disable_ssl=disable_ssl, api=api)
+    elif args.command == "list-running":
+        await list_apps(running=True, disable_ssl=disable_ssl, api=api)
+    elif args.command == "list-services":
+        await list_services(disable_ssl=disable_ssl, verbose=verbose, api=api)
+    elif args.command == "logs":
+        await get_logs(args.session_id, disable_ssl=disable_ssl, api=api)
+    else:
+        raise ValueError(f"Unknown command: {args.command}")
+
+def _read_batch_file(batch_path: str) -> List[List[str]]:
+    """
+    Read a JSONL batch file where each non-empty line is a JSON array of CLI arguments.
+    
+    Args:
+        batch_path: Path to the batch file
+        
+    Returns:
+        List of argument lists, one per command
+    """
+    commands = []
+    with open(batch_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            argv = json.loads(line)
+            if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                raise ValueError(f"{batch_path}:{line_no}: expected a JSON array of strings")
+            commands.append(argv)
+    return commands
+
+async def run_batch(batch_path: str, disable_ssl: bool = False, verbose: bool = False):
+    """Run the commands listed in a batch file over a single server connection."""
+    try:
+        commands = _read_batch_file(batch_path)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read batch file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # Validate every command before connecting, so a typo fails fast
+    parser = _build_parser()
+    parsed = [parser.parse_args(argv) for argv in commands]
+    for argv, args in zip(commands, parsed):
+        if args.command in (None, "batch", "serve"):
+            print(f"❌ Invalid batch command: {' '.join(argv)}", file=sys.stderr)
+            sys.exit(1)
+        args.verbose = args.verbose or verbose
+
+    async with hypha_session(disable_ssl) as api:
+        for argv, args in zip(commands, parsed):
+            print(f"▶️ {' '.join(argv)}")
+            await dispatch_command(args, disable_ssl=disable_ssl, api=api)
+
+_CAPTURE_BUFFERS: ContextVar[Optional[Tuple[io.StringIO, io.StringIO]]] = ContextVar("_CAPTURE_BUFFERS", default=None)
+_capture_depth = 0
+
+class _TaskLocalStream(io.TextIOBase):
+    """Stand-in for sys.stdout/sys.stderr that writes to the current task's capture buffer."""
+
+    def __init__(self, original: Any, index: int):
+        self.original = original
+        self.index = index
+
+    def write(self, text: str) -> int:
+        buffers = _CAPTURE_BUFFERS.get()
+        target = buffers[self.index] if buffers is not None else self.original
+        return target.write(text)
+
+    def flush(self) -> None:
+        self.original.flush()
+
+@contextmanager
+def capture_output() -> Iterator[Tuple[io.StringIO, io.StringIO]]:
+    """
+    Capture what the current task (or thread) prints to stdout and stderr.
+    
+    Unlike contextlib.redirect_stdout this is safe to use from concurrent
+    asyncio tasks: each task only sees its own output in its buffers,
+    and anything printed outside a capture still reaches the terminal.
+    
+    Yields:
+        Tuple of (stdout, stderr) buffers
+    """
+    global _capture_depth
+    if _capture_depth == 0:
+        sys.stdout = _TaskLocalStream(sys.stdout, 0)
+        sys.stderr = _TaskLocalStream(sys.stderr, 1)
+    _capture_depth += 1
+    buffers = (io.StringIO(), io.StringIO())
+    token = _CAPTURE_BUFFERS.set(buffers)
+    try:
+        yield buffers
+    finally:
+        _CAPTURE_BUFFERS.reset(token)
+        _capture_depth -= 1
+        if _capture_depth == 0:
+            sys.stdout = sys.stdout.original
+            sys.stderr = sys.stderr.original
+
+async def run_captured(argv: List[str], disable_ssl: bool = False, api: Any = None) -> Dict[str, Any]:
+    """
+    Run a single command, capturing its output instead of printing it.
+    
+    Args:
+        argv: Command arguments, e.g. ["start", "--app-id", "my-app"]
+        disable_ssl: Disable SSL if a new connection has to be made
+        api: Existing server connection to reuse
+        
+    Returns:
+        Dictionary with the returncode, stdout and stderr of the command
+    """
+    returncode = 0
+    with capture_output() as (stdout, stderr):
+        try:
+            args = _build_parser().parse_args(argv)
+            await dispatch_command(args, disable_ssl=disable_ssl or args.disable_ssl, api=api)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+    return {"returncode": returncode, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+async def serve(disable_ssl: bool = False):
+    """
+    Run commands read from stdin over a single server connection.
+    
+    Each input line is a JSON array of command arguments; for each one a
+    JSON object with the returncode, stdout and stderr of the command is
+    written to stdout as a single line. Anything else the CLI prints
+    (e.g. while connecting) goes to stderr to keep the protocol clean.
+    """
+    responses = sys.stdout
+    with redirect_stdout(sys.stderr):
+        async with hypha_session(disable_ssl) as api:
+            while True:
+                line = await asyncio.to_thread(sys.stdin.readline)
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    argv = json.loads(line)
+                    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                        raise ValueError("expected a JSON array of strings")
+                except ValueError as e:
+                    result = {"returncode": 2, "stdout": "", "stderr": f"❌ Invalid command: {e}\n"}
+                else:
+                    result = await run_captured(argv, disable_ssl=disable_ssl, api=api)
+                responses.write(json.dumps(result) + "\n")
+                responses.flush()
+
+# Subcommands without options; these are dispatched without building the argparse parser
+SIMPLE_COMMANDS = {"debug-token", "login", "list-installed", "list-running", "list-services", "stop-all-apps"}
+GLOBAL_FLAGS = {"--disable-ssl", "--verbose"}
+
+def _parse_simple_args(argv: List[str]) -> Optional[SimpleNamespace]:
+    """Parse `[global flags] <command>` for option-less commands, or return None."""
+    if not argv or argv[-1] not in SIMPLE_COMMANDS or not set(argv[:-1]) <= GLOBAL_FLAGS:
+        return None
+    flags = argv[:-1]
+    return SimpleNamespace(
+        command=argv[-1],
+        disable_ssl="--disable-ssl" in flags,
+        verbose="--verbose" in flags,
+    )
+
+def _build_parser():
+    import argparse
+
     parser = argparse.ArgumentParser(description="Hypha Apps CLI")
     parser.add_argument("--disable-ssl", action="store_true", help="Disable SSL (set ssl=None)")
+    parser.add_argument("--verbose", action="store_true", help="Print full JSON details (app info, service descriptions)")
     subparsers = parser.add_subparsers(dest="command")
 
     install = subparsers.add_parser("install", help="Install an app")
@@ -671,10 +1015,8 @@ def main():
     
     stop_all_instances_ = subparsers.add_parser("stop-all-instances", help="Stop all running instances of an app")
     stop_all_instances_.add_argument("--app-id", required=True)
-    stop_all_instances_.set_defaults(func=stop_all_instances)
 
-    stop_all_apps_ = subparsers.add_parser("stop-all-apps", help="Stop all running apps")
-    stop_all_apps_.set_defaults(func=stop_all_apps)
+    subparsers.add_parser("stop-all-apps", help="Stop all running apps")
 
     uninstall = subparsers.add_parser("uninstall", help="Uninstall an app")
     uninstall.add_argument("--app-id", required=True)
@@ -686,37 +1028,36 @@ def main():
     subparsers.add_parser("list-running", help="List all currently running apps")
     subparsers.add_parser("list-services", help="List all available services")
 
-    args = parser.parse_args()
+    batch = subparsers.add_parser("batch", help="Run several commands over a single server connection")
+    batch.add_argument("--file", required=True, help="JSONL file with one JSON array of command arguments per line")
+
+    subparsers.add_parser("serve", help="Run JSON-encoded commands from stdin over a single server connection")
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    """Run the CLI with the given arguments (defaults to sys.argv[1:])."""
+    if argv is None:
+        argv = sys.argv[1:]
+    args = _parse_simple_args(argv)
+    if args is None:
+        parser = _build_parser()
+        args = parser.parse_args(argv)
+
+    # Only touch the filesystem for .env once we know a command will run
+    if args.command is not None:
+        maybe_load_env()
 
     # CLI flags override env vars
     disable_ssl = getattr(args, "disable_ssl", False) or get_bool_env("HYPHA_DISABLE_SSL", False)
 
-    if args.command == "install":
-        asyncio.run(install_app(args.app_id, args.source, args.manifest, args.files, args.overwrite, disable_ssl=disable_ssl))
-    elif args.command == "start":
-        asyncio.run(start_app(args.app_id, disable_ssl=disable_ssl))
-    elif args.command == "stop":
-        asyncio.run(stop_app(args.session_id, disable_ssl=disable_ssl))
-    elif args.command == "stop-all-instances":
-        asyncio.run(stop_all_instances(args.app_id, disable_ssl=disable_ssl))
-    elif args.command == "stop-all-apps":
-        asyncio.run(stop_all_apps(disable_ssl=disable_ssl))
-    elif args.command == "uninstall":
-        asyncio.run(uninstall_app(args.app_id, disable_ssl=disable_ssl))
-    elif args.command == "debug-token":
-        asyncio.run(debug_token_info())
-    elif args.command == "login":
-        asyncio.run(login_command(disable_ssl=disable_ssl))
-    elif args.command == "list-installed":
-        asyncio.run(list_apps(running=False, disable_ssl=disable_ssl))
-    elif args.command == "list-running":
-        asyncio.run(list_apps(running=True, disable_ssl=disable_ssl))
-    elif args.command == "list-services":
-        asyncio.run(list_services(disable_ssl=disable_ssl))
-    elif args.command == "logs":
-        asyncio.run(get_logs(args.session_id, disable_ssl=disable_ssl))
-    else:
+    if args.command is None:
         parser.print_help()
+    elif args.command == "batch":
+        asyncio.run(run_batch(args.file, disable_ssl=disable_ssl, verbose=args.verbose))
+    elif args.command == "serve":
+        asyncio.run(serve(disable_ssl=disable_ssl))
+    else:
+        asyncio.run(dispatch_command(args, disable_ssl=disable_ssl))
 
 if __name__ == "__main__":
     main()
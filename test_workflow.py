@@ -15,51 +15,258 @@ Key concepts tested:
 - Stop command now requires session_id (specific instance) not app_id (definition)
 
 Usage:
-    python test_workflow.py
+    python test_workflow.py [--isolated | --worker]
+
+By default every step runs the CLI command in this process over one
+shared server connection, so interpreter start-up, imports and the
+connection handshake are paid once (the same approach as
+`python -m hypha_apps_cli batch`). Pass --isolated to run each step as a
+separate `python -m hypha_apps_cli` subprocess with its own connection
+instead (e.g. to make sure no state leaks between steps), or --worker to
+send every step to one long-lived `python -m hypha_apps_cli serve`
+subprocess, which keeps the CLI out of this process but still pays
+start-up and the connection handshake only once.
+
+If a step fails, the sessions it started are stopped and the apps it
+installed are uninstalled again (in reverse order) before the script
+exits, so a failed run does not leave state behind on the server.
 
 Make sure your .env file is configured before running this script.
 """
 
+import asyncio
+import io
+import json
 import os
+import queue
+import re
+import selectors
+import shlex
 import subprocess
 import sys
+import threading
 import time
-import re
+from collections import deque
+from pathlib import Path
 
-def run_command(cmd, description, capture_session_id=False):
-    """Run a CLI command and print results, optionally capture session ID"""
-    print(f"\n{'='*60}")
-    print(f"🧪 {description}")
-    print(f"Command: {cmd}")
-    print(f"{'='*60}")
-    
+from dotenv import dotenv_values
+
+from hypha_apps_cli.__main__ import get_bool_env, hypha_session, run_captured
+
+# Used to run (and display) each step as a subprocess with --isolated/--worker.
+# -S/-I are not used: the CLI needs site-packages, and -I would also
+# drop the working directory that provides hypha_apps_cli from sys.path.
+CLI_COMMAND = [sys.executable, "-m", "hypha_apps_cli"]
+SESSION_ID_MARKER = "with session ID: "
+BANNER = "\n" + "=" * 60 + "\n🧪 {description}\nCommand: {command}\n" + "=" * 60
+# How much of each output stream an --isolated step keeps for its report
+OUTPUT_TAIL_LINES = 200
+# Longer lines are cut into pieces of this size
+OUTPUT_MAX_LINE_BYTES = 64 * 1024
+# Seconds each command may take, so a hang in a quick command fails fast
+STEP_TIMEOUTS = {"install": 20, "start": 30, "list-running": 3, "stop": 5, "uninstall": 10}
+DEFAULT_STEP_TIMEOUT = 30
+# Added for interpreter start-up, imports and the connection handshake, to every
+# --isolated step and to the first --worker request
+SUBPROCESS_STARTUP_TIMEOUT = 10
+# Errors that waiting cannot fix: an --isolated step that prints one of these to
+# stderr is killed at once instead of running into its timeout. Extend the
+# alternation to stop on other errors as well.
+FATAL_STDERR_PATTERN = re.compile(
+    r"(\b401\b|Auth(?:entication)? failed|Connection refused|ECONNREFUSED)", re.I
+)
+RUN_ISOLATED = "--isolated" in sys.argv[1:]
+RUN_WITH_WORKER = "--worker" in sys.argv[1:]
+
+class FatalOutputError(Exception):
+    """Raised when a CLI subprocess reports an error matching FATAL_STDERR_PATTERN."""
+
+def step_timeout(args):
+    """The timeout in seconds for a CLI command given as a list of arguments."""
+    return STEP_TIMEOUTS.get(args[0], DEFAULT_STEP_TIMEOUT)
+
+def _completed(args, result):
+    """Wrap a run_captured()-style result dict as a CompletedProcess."""
+    return subprocess.CompletedProcess(args, result["returncode"], result["stdout"], result["stderr"])
+
+def in_process_runner(api):
+    """Return a runner that runs CLI commands in this process over the shared connection."""
+    async def run(args):
+        result = await asyncio.wait_for(run_captured(args, api=api), step_timeout(args))
+        return _completed(args, result)
+    return run
+
+def _run_streamed(argv, timeout):
+    """Run argv, keeping only the last OUTPUT_TAIL_LINES lines of each output stream.
+
+    Both pipes are drained as the command writes them, so a chatty command
+    neither fills a pipe nor gets buffered whole in memory. The pipes are
+    read unbuffered and split into lines here, so the deadline is checked
+    even while the command is in the middle of writing a line.
+    """
+    with subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        deadline = time.monotonic() + timeout
+        stdout_fd, stderr_fd = proc.stdout.fileno(), proc.stderr.fileno()
+        tails = {stdout_fd: deque(maxlen=OUTPUT_TAIL_LINES), stderr_fd: deque(maxlen=OUTPUT_TAIL_LINES)}
+        # The unterminated last line of each stream
+        partial = {stdout_fd: b"", stderr_fd: b""}
+
+        def add_line(fd, line):
+            text = line.decode("utf-8", "replace") + "\n"
+            tails[fd].append(text)
+            if fd == stderr_fd and FATAL_STDERR_PATTERN.search(text):
+                raise FatalOutputError(text.strip())
+
+        try:
+            with selectors.DefaultSelector() as selector:
+                for fd in tails:
+                    selector.register(fd, selectors.EVENT_READ)
+                while selector.get_map():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise subprocess.TimeoutExpired(argv, timeout)
+                    for key, _ in selector.select(remaining):
+                        fd = key.fd
+                        chunk = os.read(fd, 65536)
+                        if not chunk:
+                            selector.unregister(fd)
+                            if partial[fd]:
+                                add_line(fd, partial[fd])
+                            continue
+                        *lines, partial[fd] = (partial[fd] + chunk).split(b"\n")
+                        if len(partial[fd]) > OUTPUT_MAX_LINE_BYTES:
+                            lines.append(partial[fd])
+                            partial[fd] = b""
+                        for line in lines:
+                            add_line(fd, line)
+            returncode = proc.wait(max(deadline - time.monotonic(), 0))
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+    return subprocess.CompletedProcess(argv, returncode, "".join(tails[stdout_fd]), "".join(tails[stderr_fd]))
+
+async def run_isolated(args):
+    """Run a CLI command in its own subprocess."""
+    timeout = step_timeout(args) + SUBPROCESS_STARTUP_TIMEOUT
+    return await asyncio.to_thread(_run_streamed, [*CLI_COMMAND, *args], timeout)
+
+class WorkerClient:
+    """A long-lived `hypha_apps_cli serve` subprocess that runs one command per request."""
+
+    def __init__(self):
+        # Requests share one pipe, so concurrent steps must take turns
+        self.lock = threading.Lock()
+        self._spawn()
+
+    def _spawn(self):
+        self.proc = subprocess.Popen(
+            [*CLI_COMMAND, "serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        # Replies are read on a thread so that waiting for one can time out
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read_replies, args=(self.proc, self.replies), daemon=True).start()
+        # The worker connects before answering its first request
+        self.connected = False
+
+    @staticmethod
+    def _read_replies(proc, replies):
+        for line in proc.stdout:
+            replies.put(line)
+        replies.put(None)
+
+    def run(self, args):
+        with self.lock:
+            timeout = step_timeout(args) + (0 if self.connected else SUBPROCESS_STARTUP_TIMEOUT)
+            self.proc.stdin.write(json.dumps(args) + "\n")
+            self.proc.stdin.flush()
+            try:
+                line = self.replies.get(timeout=timeout)
+            except queue.Empty:
+                # A late reply would be taken as the answer to the next request,
+                # so replace the worker instead of waiting for it
+                self.proc.kill()
+                self.proc.wait()
+                self.proc.stdin.close()
+                self._spawn()
+                raise subprocess.TimeoutExpired(args, timeout)
+            if line is None:
+                raise RuntimeError(f"CLI worker exited with code {self.proc.wait()}")
+            self.connected = True
+        return _completed(args, json.loads(line))
+
+    async def run_async(self, args):
+        return await asyncio.to_thread(self.run, args)
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait(timeout=30)
+
+async def wait_ready(predicate, timeout=5.0):
+    """Poll an async predicate, backing off from 50 ms to 500 ms, until it holds or timeout passes."""
+    delay = 0.05
+    deadline = time.monotonic() + timeout
+    while not await predicate():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.6, 0.5)
+    return True
+
+async def session_gone(session_id, runner):
+    """Whether list-running no longer shows the session."""
+    result = await runner(["list-running"])
+    return result.returncode == 0 and f"`{session_id}`" not in result.stdout
+
+async def run_command(args, description, capture_session_id=False, runner=run_isolated):
+    """Run a CLI command (given as a list of arguments) and print results, optionally capture session ID
+
+    The report is printed in one piece once the command finishes, so that
+    commands running concurrently do not interleave their output.
+    """
+    report = [BANNER.format(description=description, command=shlex.join([*CLI_COMMAND, *args]))]
+    success, session_id = await _run_and_report(args, capture_session_id, runner, report)
+    sys.stdout.write("\n".join(report) + "\n")
+    sys.stdout.flush()
+    return success, session_id
+
+async def _run_and_report(args, capture_session_id, runner, report):
+    """Run a CLI command, appending the lines to print to `report`."""
     session_id = None
     
     try:
-        result = subprocess.run(cmd.split(), capture_output=True, text=True, timeout=30)
+        result = await runner(args)
         if result.returncode == 0:
-            print("✅ Success!")
+            report.append("✅ Success!")
             if result.stdout:
-                print("Output:")
-                print(result.stdout)
+                report.append("Output:")
+                report.append(result.stdout)
                 
                 # Extract session ID from start command output
-                if capture_session_id and "with session ID:" in result.stdout:
-                    match = re.search(r"with session ID: ([^\s\n]+)", result.stdout)
-                    if match:
-                        session_id = match.group(1)
-                        print(f"📝 Captured session ID: {session_id}")
+                if capture_session_id and SESSION_ID_MARKER in result.stdout:
+                    tail = result.stdout.rsplit(SESSION_ID_MARKER, 1)[1].split()
+                    if tail:
+                        session_id = tail[0]
+                        report.append(f"📝 Captured session ID: {session_id}")
         else:
-            print("❌ Failed!")
+            report.append("❌ Failed!")
             if result.stderr:
-                print("Error:")
-                print(result.stderr)
+                report.append("Error:")
+                report.append(result.stderr)
             return False, None
-    except subprocess.TimeoutExpired:
-        print("⏰ Command timed out!")
+    except (subprocess.TimeoutExpired, asyncio.TimeoutError):
+        report.append("⏰ Command timed out!")
+        return False, None
+    except FatalOutputError as e:
+        report.append(f"🛑 Stopped on fatal error: {e}")
         return False, None
     except Exception as e:
-        print(f"💥 Exception: {e}")
+        report.append(f"💥 Exception: {e}")
         return False, None
     
     return True, session_id
@@ -69,12 +276,17 @@ def main():
     print("This test demonstrates app_id (definitions) vs session_id (running instances)")
     print("Make sure your .env file is configured!")
     
-    # Check if .env exists
-    if not os.path.exists('.env'):
+    # Read .env once; every mode then finds the configuration in os.environ
+    try:
+        env_text = Path(".env").read_text()
+    except FileNotFoundError:
         print("\n❌ No .env file found!")
         print("Please create a .env file with your Hypha server configuration.")
         print("See the README.md for instructions.")
         sys.exit(1)
+    for key, value in dotenv_values(stream=io.StringIO(env_text)).items():
+        if value is not None:
+            os.environ.setdefault(key, value)
     
     app_id = "hello-demo-test"
     app_id_with_files = f"{app_id}-with-files"
@@ -86,67 +298,130 @@ def main():
     print(f"  • Stop specific sessions using session_ids (not app_ids)")
     print(f"  • Uninstall app definitions")
     
+    asyncio.run(run_workflow(app_id, app_id_with_files))
+
+async def run_workflow(app_id, app_id_with_files):
+    """Run the workflow in this process over one shared connection, or through --isolated/--worker subprocesses."""
+    if RUN_ISOLATED:
+        await run_steps(app_id, app_id_with_files, run_isolated)
+        return
+
+    if RUN_WITH_WORKER:
+        worker = WorkerClient()
+        try:
+            await run_steps(app_id, app_id_with_files, worker.run_async)
+        finally:
+            worker.close()
+        return
+
+    try:
+        async with hypha_session(get_bool_env("HYPHA_DISABLE_SSL", False)) as api:
+            await run_steps(app_id, app_id_with_files, in_process_runner(api))
+    except SystemExit:
+        # connect() has already explained what is missing
+        print("\n❌ Could not connect to the Hypha server")
+    except Exception as e:
+        print(f"\n💥 Connection to the Hypha server failed: {e}")
+        print("Make sure your .env file contains valid credentials.")
+
+async def run_steps(app_id, app_id_with_files, runner):
+    """Run the workflow steps and print a summary, then roll back anything left behind."""
+    # ("install", app_id) and ("start", session_id) of the steps not undone yet
+    completed = []
+    try:
+        await _run_steps(app_id, app_id_with_files, runner, completed)
+    finally:
+        await rollback(completed, runner)
+
+async def rollback(completed, runner):
+    """Undo the steps left in `completed` in reverse order."""
+    for step, target in reversed(completed):
+        if step == "start":
+            action = f"stopping session '{target}'"
+            success, _ = await run_command(["stop", "--session-id", target], f"Rollback: {action}", runner=runner)
+        else:
+            action = f"uninstalling app '{target}'"
+            success, _ = await run_command(["uninstall", "--app-id", target], f"Rollback: {action}", runner=runner)
+        print(f"🧹 rollback: {action} {'done' if success else 'failed'}")
+
+async def _run_steps(app_id, app_id_with_files, runner, completed):
+    """Run the workflow steps, recording in `completed` what would need undoing."""
     # Track session IDs for stopping
     session_ids = {}
     
     # Step 1: Install basic app
-    success, _ = run_command(
-        f"python -m hypha_apps_cli install --app-id {app_id} --manifest=manifest.yaml --source=main.py --overwrite",
-        f"Installing demo app definition (app_id: {app_id})"
+    success, _ = await run_command(
+        ["install", "--app-id", app_id, "--manifest=manifest.yaml", "--source=main.py", "--overwrite"],
+        f"Installing demo app definition (app_id: {app_id})",
+        runner=runner,
     )
     if not success:
         print("❌ Failed to install basic app")
         return
+    completed.append(("install", app_id))
     
     # Step 2: Start basic app and capture session ID
-    success, session_id = run_command(
-        f"python -m hypha_apps_cli start --app-id {app_id}",
+    success, session_id = await run_command(
+        ["start", "--app-id", app_id],
         f"Starting app session from app_id '{app_id}' (creates session_id)",
-        capture_session_id=True
+        capture_session_id=True,
+        runner=runner,
     )
     if not success:
         print("❌ Failed to start basic app")
         return
     if session_id:
         session_ids[app_id] = session_id
+        completed.append(("start", session_id))
     
     # Step 3: Stop basic app using session ID
     if app_id in session_ids:
-        success, _ = run_command(
-            f"python -m hypha_apps_cli stop --session-id {session_ids[app_id]}",
-            f"Stopping session '{session_ids[app_id]}' (specific instance)"
+        stop_step = run_command(
+            ["stop", "--session-id", session_ids[app_id]],
+            f"Stopping session '{session_ids[app_id]}' (specific instance)",
+            runner=runner,
         )
-        if not success:
-            print("❌ Failed to stop basic app session")
-            return
     else:
         print("⚠️ Skipping stop - no session ID captured")
+        stop_step = asyncio.sleep(0, result=(True, None))
     
-    # Step 4: Install app with files
-    success, _ = run_command(
-        f"python -m hypha_apps_cli install --app-id {app_id_with_files} --manifest=manifest.yaml --source=main.py --files=example-files --overwrite",
-        f"Installing demo app with files (app_id: {app_id_with_files})"
+    # Step 4: Install app with files, concurrently with step 3 (the apps are independent)
+    install_step = run_command(
+        ["install", "--app-id", app_id_with_files, "--manifest=manifest.yaml", "--source=main.py", "--files=example-files", "--overwrite"],
+        f"Installing demo app with files (app_id: {app_id_with_files})",
+        runner=runner,
     )
-    if not success:
+    (stopped, _), (installed, _) = await asyncio.gather(stop_step, install_step)
+    if stopped and app_id in session_ids:
+        completed.remove(("start", session_ids[app_id]))
+    if installed:
+        completed.append(("install", app_id_with_files))
+    if not stopped:
+        print("❌ Failed to stop basic app session")
+        return
+    if not installed:
         print("❌ Failed to install app with files")
         return
     
     # Step 5: Start app with files and capture session ID
-    success, session_id = run_command(
-        f"python -m hypha_apps_cli start --app-id {app_id_with_files}",
+    success, session_id = await run_command(
+        ["start", "--app-id", app_id_with_files],
         f"Starting app session from app_id '{app_id_with_files}' (creates session_id)",
-        capture_session_id=True
+        capture_session_id=True,
+        runner=runner,
     )
     if not success:
         print("❌ Failed to start app with files")
         return
     if session_id:
         session_ids[app_id_with_files] = session_id
+        completed.append(("start", session_id))
     
     # Step 6: List running apps to see both session IDs and app IDs
-    success, _ = run_command(
-        "python -m hypha_apps_cli list-running",
-        "Listing running app sessions (shows session_ids and app_ids)"
+    success, _ = await run_command(
+        ["list-running"],
+        "Listing running app sessions (shows session_ids and app_ids)",
+        runner=runner,
     )
     if not success:
         print("❌ Failed to list running apps")
@@ -154,34 +429,45 @@ def main():
     
     # Step 7: Stop app with files using session ID
     if app_id_with_files in session_ids:
-        success, _ = run_command(
-            f"python -m hypha_apps_cli stop --session-id {session_ids[app_id_with_files]}",
-            f"Stopping session '{session_ids[app_id_with_files]}' (specific instance)"
+        success, _ = await run_command(
+            ["stop", "--session-id", session_ids[app_id_with_files]],
+            f"Stopping session '{session_ids[app_id_with_files]}' (specific instance)",
+            runner=runner,
         )
         if not success:
             print("❌ Failed to stop app with files session")
             return
+        completed.remove(("start", session_ids[app_id_with_files]))
     else:
         print("⚠️ Skipping stop - no session ID captured")
     
-    # Steps 8-9: Uninstall apps
+    # Make sure both stopped sessions have left list-running before uninstalling
+    # their apps; this usually holds on the first check
+    gone = await asyncio.gather(
+        *(wait_ready(lambda sid=sid: session_gone(sid, runner)) for sid in session_ids.values())
+    )
+    if not all(gone):
+        print("⚠️ A stopped session is still listed as running, uninstalling anyway")
+    
+    # Steps 8-9: Uninstall apps; both sessions are stopped, so run them concurrently
     remaining_commands = [
-        (f"python -m hypha_apps_cli uninstall --app-id {app_id}", 
-         f"Uninstalling app definition (app_id: {app_id})"),
-        (f"python -m hypha_apps_cli uninstall --app-id {app_id_with_files}", 
-         f"Uninstalling app definition (app_id: {app_id_with_files})"),
+        (["uninstall", "--app-id", app_id],
+         f"Uninstalling app definition (app_id: {app_id})", app_id),
+        (["uninstall", "--app-id", app_id_with_files],
+         f"Uninstalling app definition (app_id: {app_id_with_files})", app_id_with_files),
     ]
     
     success_count = 7  # We've completed 7 steps successfully so far
     
-    for cmd, description in remaining_commands:
-        success, _ = run_command(cmd, description)
+    results = await asyncio.gather(
+        *(run_command(args, description, runner=runner) for args, description, _ in remaining_commands)
+    )
+    for (_, description, uninstall_id), (success, _) in zip(remaining_commands, results):
         if success:
             success_count += 1
-            time.sleep(1)
+            completed.remove(("install", uninstall_id))
         else:
-            print(f"\n⚠️  Stopping workflow due to failed command: {description}")
-            break
+            print(f"\n⚠️  Failed command: {description}")
     
     total_steps = 9  # Total number of workflow steps
     